@@ -2,10 +2,14 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import altair as alt
+
+from talktime_core import (
+    TZ, MATRIX_TOP_COUNTRIES, MATRIX_DISPLAY_ROWS, HEATMAP_MAX_ROWS,
+    load_and_prepare, agg_rollup, top_by, attempts_by_hour, attempts_by_hour_and, download_df,
+    calls_bar_chart, matrix_bar_chart, hour_bubble_chart, hour_country_bubble_chart, agent_hour_heatmap_chart,
+)
 
 APP_TITLE = "📞 TalkTime App — v3 (Agent & Country Analytics)"
-TZ = "Asia/Kolkata"
 
 st.set_page_config(page_title="TalkTime App", layout="wide")
 
@@ -13,46 +17,10 @@ st.set_page_config(page_title="TalkTime App", layout="wide")
 # Helpers
 # --------------------
 
-def to_seconds(x):
-    if pd.isna(x):
-        return np.nan
-    if isinstance(x, (int, float)) and not isinstance(x, bool):
-        return float(x)
-    s = str(x).strip()
-    # number
-    try:
-        return float(s)
-    except:
-        pass
-    # HH:MM:SS or MM:SS
-    parts = s.split(":")
-    try:
-        parts = [float(p) for p in parts]
-    except:
-        return np.nan
-    if len(parts) == 2:
-        m, s = parts
-        return m*60 + s
-    if len(parts) == 3:
-        h, m, s = parts
-        return h*3600 + m*60 + s
-    return np.nan
-
-def combine_date_time(date_col, time_col):
-    d = pd.to_datetime(date_col, errors="coerce", dayfirst=False)
-    # attempt parsing time flexibly
-    t_series = pd.to_datetime(time_col, errors="coerce")
-    # If parsed as full datetime, take .dt.time
-    if isinstance(t_series, pd.Series) and hasattr(t_series.dt, "time"):
-        t = t_series.dt.time
-    else:
-        t = pd.NaT
-    # build naive datetime str then localize
-    dt = pd.to_datetime(pd.DataFrame({"d": d.dt.date, "t": t}).astype(str).agg(" ".join, axis=1), errors="coerce")
-    dt_local = pd.to_datetime(dt, errors="coerce").dt.tz_localize(TZ, nonexistent="NaT", ambiguous="NaT")
-    return dt_local
-
-def preset_filter(df, preset, custom_range):
+def preset_rows(df, preset, custom_range):
+    """Row bounds (lo, hi) of the period; df must be sorted by _dt_local."""
+    if df.empty:
+        return 0, 0
     now = pd.Timestamp.now(tz=TZ)
     today_start = now.normalize()
     if preset == "Today":
@@ -62,30 +30,23 @@ def preset_filter(df, preset, custom_range):
         start = end - pd.Timedelta(days=1)
     else:
         if not custom_range or not isinstance(custom_range, tuple) or len(custom_range) != 2:
-            return df
+            return 0, len(df)
         s, e = custom_range
         start = pd.Timestamp(s, tz=TZ)
         end = pd.Timestamp(e, tz=TZ) + pd.Timedelta(days=1)
-    return df[(df["_dt_local"] >= start) & (df["_dt_local"] < end)]
-
-def agg_summary(df, dims, duration_field):
-    res = (
-        df.groupby(dims, dropna=False)[duration_field]
-          .agg(["count", "sum", "mean", "median"])
-          .reset_index()
-          .rename(columns={
-              "count": "Total Calls",
-              "sum": "Total Duration (sec)",
-              "mean": "Avg Duration (sec)",
-              "median": "Median Duration (sec)"
-          })
-          .sort_values(["Total Calls","Total Duration (sec)"], ascending=[False, False])
-    )
-    return res
-
-def download_df(df, filename, label="Download CSV"):
-    csv = df.to_csv(index=False).encode("utf-8")
-    st.download_button(label, csv, file_name=filename, mime="text/csv")
+    idx = pd.DatetimeIndex(df["_dt_local"])
+    return idx.searchsorted(start, side="left"), idx.searchsorted(end, side="left")
+
+def code_mask(s, selections):
+    """Boolean mask of categorical s in selections, via a per-category lookup on the codes."""
+    lut = np.append(s.cat.categories.isin(selections), False)  # code -1 (missing) -> False
+    return lut[s.cat.codes.to_numpy()]
+
+@st.cache_data(show_spinner=False)
+def filter_options(file_id, col, _df):
+    # categories span the whole upload; offer only the values present in the timed rows
+    codes = _df[col].cat.codes.to_numpy()
+    return _df[col].cat.categories[np.unique(codes[codes >= 0])].tolist()
 
 # --------------------
 # Sidebar
@@ -99,6 +60,8 @@ with st.sidebar:
     st.header("2) Mode")
     mode = st.radio("Calls to include", ["All calls", "Only calls with duration ≥ threshold"], index=0)
     threshold = st.slider("Threshold (sec)", 10, 300, 60, 5, help="Used when filtering calls by minimum duration.")
+    matrix_median = st.checkbox("Median in Agent × Country table", value=True,
+                                help="Needs a sort per agent/country pair; untick to skip it on very large files.")
 
     st.header("3) Period")
     preset = st.radio("Pick a range", ["Today", "Yesterday", "Custom"], index=0, help="Based on IST (Asia/Kolkata).")
@@ -118,75 +81,70 @@ if not file:
 # --------------------
 
 try:
-    df = pd.read_csv(file, low_memory=False)
+    # v3 reads Date month-first (ambiguous 03/04/2025 is 4 March)
+    df, columns = load_and_prepare(file.getvalue(), dayfirst=False)
 except Exception as e:
     st.error(f"Failed to read CSV: {e}")
     st.stop()
 
+# Views only use timestamped rows: the frame is time-sorted with untimed rows last, so that is a prefix
+df = df.iloc[:df["_dt_local"].count()]
+
 expected = ["Date", "Time", "Caller", "To Name", "Call Type", "Country Name", "Call Status", "Call Duration"]
-missing = [c for c in expected if c not in df.columns]
+missing = [c for c in expected if c not in columns]
 if missing:
     st.warning(f"Missing expected columns: {', '.join(missing)}.")
 
 # Mark irrelevant
 irrelevant_cols = ["To Name"]
 
-# Parse duration & time
-df["_duration_sec"] = df["Call Duration"].apply(to_seconds) if "Call Duration" in df.columns else np.nan
-df["_dt_local"] = combine_date_time(df["Date"], df["Time"]) if {"Date","Time"}.issubset(df.columns) else pd.NaT
-
-# Derived
-df["_hour"] = df["_dt_local"].dt.hour if "_dt_local" in df.columns else np.nan
-
 # Sidebar filters
 with st.sidebar:
     # Agent (Caller)
     if "Caller" in df.columns:
-        agents = sorted(df["Caller"].dropna().astype(str).unique().tolist())
+        agents = filter_options(file.file_id, "Caller", df)
         sel_agents = st.multiselect("Agent(s)", agents, default=agents[: min(10, len(agents))])
     else:
         sel_agents = None
 
     # Country
     if "Country Name" in df.columns:
-        countries = sorted(df["Country Name"].dropna().astype(str).unique().tolist())
+        countries = filter_options(file.file_id, "Country Name", df)
         sel_countries = st.multiselect("Country(ies)", countries, default=countries[: min(10, len(countries))])
     else:
         sel_countries = None
 
     # Call Type (checkbox-like multiselect so you can choose multiple or all)
     if "Call Type" in df.columns:
-        call_types = sorted(df["Call Type"].dropna().astype(str).unique().tolist())
+        call_types = filter_options(file.file_id, "Call Type", df)
         sel_types = st.multiselect("Call Type(s) (optional)", call_types, default=call_types)
     else:
         sel_types = None
 
     # Call Status
     if "Call Status" in df.columns:
-        statuses = sorted(df["Call Status"].dropna().astype(str).unique().tolist())
+        statuses = filter_options(file.file_id, "Call Status", df)
         sel_status = st.multiselect("Call Status (choose All or subset)", statuses, default=statuses)
     else:
         sel_status = None
 
-# Filter by time window
-df_f = df.dropna(subset=["_dt_local"]).copy()
-df_f = preset_filter(df_f, preset, custom)
+# Filter by time window: a contiguous slice of the time-sorted frame
+lo, hi = preset_rows(df, preset, custom)
+df_p = df.iloc[lo:hi]
 
-# Apply other filters
-if sel_agents is not None and len(sel_agents) > 0:
-    df_f = df_f[df_f["Caller"].astype(str).isin(sel_agents)]
-if sel_countries is not None and len(sel_countries) > 0:
-    df_f = df_f[df_f["Country Name"].astype(str).isin(sel_countries)]
-if sel_types is not None and len(sel_types) > 0:
-    df_f = df_f[df_f["Call Type"].astype(str).isin(sel_types)]
-if sel_status is not None and len(sel_status) > 0:
-    df_f = df_f[df_f["Call Status"].astype(str).isin(sel_status)]
+# Apply other filters onto one mask, then slice once
+mask = np.ones(len(df_p), dtype=bool)
+for col, sel in [("Caller", sel_agents), ("Country Name", sel_countries),
+                 ("Call Type", sel_types), ("Call Status", sel_status)]:
+    if sel:
+        mask &= code_mask(df_p[col], sel)
+df_f = df_p.loc[mask]
 
 # Apply talktime filter if requested
 if mode.startswith("Only calls"):
-    df_view = df_f[df_f["_duration_sec"] >= float(threshold)].copy()
+    df_view = df_f[df_f["_duration_sec"] >= np.float32(threshold)]
 else:
-    df_view = df_f.copy()
+    df_view = df_f
 
 # --------------------
 # KPIs
@@ -204,6 +162,10 @@ st.caption(f"Mode: **{mode}** | Threshold: **{threshold}s** | Period: **{preset}
 # Tabs
 # --------------------
 
+# One grouping of df_view feeds the Agent, Country and Agent × Country tables
+dims = [c for c in ["Caller","Country Name"] if c in df_view.columns]
+views = agg_rollup(df_view, dims, "_duration_sec", include_median=matrix_median) if dims else {}
+
 tab1, tab2, tab3, tab4 = st.tabs([
     "Agent-wise (Caller)", "Country-wise", "Agent × Country", "24h Engagement"
 ])
@@ -211,48 +173,34 @@ tab1, tab2, tab3, tab4 = st.tabs([
 with tab1:
     st.markdown("### Agent-wise — Total number of calls and durations")
     if "Caller" in df_view.columns:
-        agg = agg_summary(df_view, ["Caller"], "_duration_sec")
+        agg = views[("Caller",)]
         st.dataframe(agg, use_container_width=True)
         download_df(agg, "agent_wise_calls.csv")
-        # Chart
-        chart = alt.Chart(agg).mark_bar().encode(
-            x=alt.X("Caller:N", sort="-y", title="Agent"),
-            y=alt.Y("Total Calls:Q"),
-            tooltip=["Caller","Total Calls","Total Duration (sec)","Avg Duration (sec)","Median Duration (sec)"]
-        ).properties(height=360).interactive()
-        st.altair_chart(chart, use_container_width=True)
+        st.altair_chart(calls_bar_chart(agg, "Caller", "Agent"), use_container_width=True)
     else:
         st.info("Column 'Caller' missing.")
 
 with tab2:
     st.markdown("### Country-wise — Total number of calls and durations")
     if "Country Name" in df_view.columns:
-        agg = agg_summary(df_view, ["Country Name"], "_duration_sec")
+        agg = views[("Country Name",)]
         st.dataframe(agg, use_container_width=True)
         download_df(agg, "country_wise_calls.csv")
-        chart = alt.Chart(agg).mark_bar().encode(
-            x=alt.X("Country Name:N", sort="-y", title="Country"),
-            y=alt.Y("Total Calls:Q"),
-            tooltip=["Country Name","Total Calls","Total Duration (sec)","Avg Duration (sec)","Median Duration (sec)"]
-        ).properties(height=360).interactive()
-        st.altair_chart(chart, use_container_width=True)
+        st.altair_chart(calls_bar_chart(agg, "Country Name", "Country"), use_container_width=True)
     else:
         st.info("Column 'Country Name' missing.")
 
 with tab3:
     st.markdown("### Agent × Country — Matrix")
     if {"Caller","Country Name"}.issubset(df_view.columns):
-        agg = agg_summary(df_view, ["Caller","Country Name"], "_duration_sec")
-        st.dataframe(agg, use_container_width=True)
+        agg = views[("Caller","Country Name")]
+        show_all = len(agg) <= MATRIX_DISPLAY_ROWS or st.checkbox(f"Show all {len(agg):,} rows", key="matrix_show_all")
+        st.dataframe(agg if show_all else agg.head(MATRIX_DISPLAY_ROWS), use_container_width=True)
         download_df(agg, "agent_country_matrix.csv")
-        # Stacked bar by country within agent
-        chart = alt.Chart(agg).mark_bar().encode(
-            x=alt.X("Caller:N", sort=alt.SortField("Total Calls", order="descending"), title="Agent"),
-            y=alt.Y("Total Calls:Q"),
-            color=alt.Color("Country Name:N", title="Country"),
-            tooltip=["Caller","Country Name","Total Calls","Total Duration (sec)"]
-        ).properties(height=380).interactive()
-        st.altair_chart(chart, use_container_width=True)
+        if agg["Country Name"].nunique() > MATRIX_TOP_COUNTRIES:
+            agg = top_by(agg, "Country Name", "Total Calls", MATRIX_TOP_COUNTRIES)
+            st.caption(f"Chart shows the top {MATRIX_TOP_COUNTRIES} countries by calls; the table and CSV include all.")
+        st.altair_chart(matrix_bar_chart(agg), use_container_width=True)
     else:
         st.info("Need 'Caller' and 'Country Name'.")
 
@@ -260,45 +208,30 @@ with tab4:
     st.markdown("### 24h Engagement — When do agents attempt calls, and for which country?")
     if df_f["_hour"].notna().any():
         # attempts are based on filtered df_f (before duration filter)
-        attempts = df_f.groupby(["_hour"]).size().reset_index(name="Attempts").rename(columns={"_hour":"Hour"})
+        attempts = attempts_by_hour(df_f)
         c1, c2 = st.columns(2)
         with c1:
             st.dataframe(attempts.sort_values("Hour"), use_container_width=True)
             download_df(attempts.sort_values("Hour"), "attempts_by_hour.csv")
         with c2:
-            chart = alt.Chart(attempts).mark_circle().encode(
-                x=alt.X("Hour:O", title="Hour (0–23, IST)"),
-                y=alt.Y("Attempts:Q"),
-                size=alt.Size("Attempts:Q", legend=None),
-                tooltip=["Hour:O","Attempts:Q"]
-            ).properties(height=340).interactive()
-            st.altair_chart(chart, use_container_width=True)
+            st.altair_chart(hour_bubble_chart(attempts), use_container_width=True)
 
         st.divider()
         st.markdown("**Bubble: Hour vs Country (Attempts)**")
         if "Country Name" in df_f.columns:
-            a2 = (df_f.groupby(["_hour","Country Name"]).size()
-                    .reset_index(name="Attempts").rename(columns={"_hour":"Hour"}))
-            bubble = alt.Chart(a2).mark_circle().encode(
-                x=alt.X("Hour:O"),
-                y=alt.Y("Country Name:N", title="Country"),
-                size=alt.Size("Attempts:Q", legend=None),
-                tooltip=["Hour:O","Country Name:N","Attempts:Q"]
-            ).properties(height=420).interactive()
-            st.altair_chart(bubble, use_container_width=True)
+            a2 = attempts_by_hour_and(df_f, "Country Name")[["Hour","Country Name","Attempts"]]
+            st.altair_chart(hour_country_bubble_chart(a2), use_container_width=True)
             download_df(a2.sort_values(["Country Name","Hour"]), "hour_country_bubble.csv")
 
         st.divider()
         st.markdown("**Heatmap: Agent × Hour (Attempts)**")
         if "Caller" in df_f.columns:
-            hh = df_f.groupby(["Caller","_hour"]).size().reset_index(name="Attempts").rename(columns={"_hour":"Hour"})
-            heat = alt.Chart(hh).mark_rect().encode(
-                x=alt.X("Hour:O"),
-                y=alt.Y("Caller:N", title="Agent"),
-                color=alt.Color("Attempts:Q"),
-                tooltip=["Caller","Hour","Attempts"]
-            ).properties(height=420).interactive()
-            st.altair_chart(heat, use_container_width=True)
+            hh = attempts_by_hour_and(df_f, "Caller")
+            hh_chart = hh
+            if len(hh) > HEATMAP_MAX_ROWS:
+                hh_chart = top_by(hh, "Caller", "Attempts", HEATMAP_MAX_ROWS // 24)
+                st.caption(f"Chart shows the top {HEATMAP_MAX_ROWS // 24} agents by attempts; the CSV includes all.")
+            st.altair_chart(agent_hour_heatmap_chart(hh_chart), use_container_width=True)
             download_df(hh.sort_values(["Caller","Hour"]), "agent_hour_heatmap.csv")
     else:
         st.info("No valid Date/Time to compute 24h engagement.")
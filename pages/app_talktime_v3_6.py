@@ -0,0 +1,330 @@
+
+import re
+from functools import lru_cache
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from talktime_core import (
+    TZ, MATRIX_TOP_COUNTRIES, MATRIX_DISPLAY_ROWS, HEATMAP_MAX_ROWS,
+    load_and_prepare, agg_rollup, rank_rows, top_by, attempts_by_hour, attempts_by_hour_and, download_df,
+    calls_bar_chart, matrix_bar_chart, hour_bubble_chart, hour_country_bubble_chart, agent_hour_heatmap_chart,
+)
+
+APP_TITLE = "📞 TalkTime App — v3.6 (B2C radio + MT Team checkbox)"
+
+st.set_page_config(page_title="TalkTime App", layout="wide")
+
+# --------------------
+# Helpers
+# --------------------
+
+def date_preset_bounds(preset, custom_range):
+    now = pd.Timestamp.now(tz=TZ)
+    today = now.date()
+    if preset == "Today":
+        start_date, end_date = today, today
+    elif preset == "Yesterday":
+        yday = (now - pd.Timedelta(days=1)).date()
+        start_date, end_date = yday, yday
+    else:
+        if not custom_range or not isinstance(custom_range, tuple) or len(custom_range) != 2:
+            return None
+        start_date, end_date = custom_range
+    return start_date, end_date
+
+def date_mask(df, start_date, end_date):
+    """Rows whose Date falls in [start_date, end_date]; all False without a parsed date."""
+    if "_date_only" not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    d = df["_date_only"]
+    return ((d >= pd.Timestamp(start_date)) & (d <= pd.Timestamp(end_date))).to_numpy()
+
+@st.cache_data(show_spinner=False)
+def unique_sorted(file_id, col, _df):
+    # the dims are categorical: categories are already the sorted distinct values, no column scan
+    return _df[col].cat.categories.tolist()
+
+@lru_cache(maxsize=None)
+def norm_name(s):
+    if pd.isna(s):
+        return ""
+    s = str(s).lower().strip()
+    keep = []
+    for ch in s:
+        if ch.isalnum():
+            keep.append(ch)
+        elif ch.isspace():
+            keep.append(" ")
+    s = "".join(keep)
+    s = " ".join(s.split())
+    return s
+
+def match_targets(names, targets_norm, ratio_cut=0.85):
+    """Boolean array: which of `names` hit any target (substring/token or fuzzy ratio)."""
+    targets = [t for t in targets_norm if t]
+    norm = pd.Series([norm_name(n) for n in names], dtype=object)
+    if norm.empty or not targets:
+        return np.zeros(len(norm), dtype=bool)
+    empty = (norm == "").to_numpy()
+    # Cheap tests in C: any target token inside the name (a whole target contains its tokens),
+    # or the name inside a target (targets joined on newlines, which normalized names never contain)
+    tokens = sorted({tok for t in targets for tok in t.split()}, key=len, reverse=True)
+    hit = norm.str.contains("|".join(map(re.escape, tokens)), regex=True).to_numpy(dtype=bool)
+    joined = "\n".join(targets)
+    hit |= np.array([n in joined for n in norm])
+    hit &= ~empty
+    # RapidFuzz only for the names the substring tests missed
+    rest = np.flatnonzero(~hit & ~empty)
+    if len(rest):
+        scores = process.cdist(norm.iloc[rest].tolist(), targets, scorer=fuzz.ratio, score_cutoff=ratio_cut * 100)
+        hit[rest] = scores.max(axis=1) >= ratio_cut * 100
+    return hit
+
+# --------------------
+# Teams (fixed lists + fuzzy)
+# --------------------
+B2C_TARGETS_RAW = [
+    "Kamaldeep singh",
+    "Ria Arora",
+    "ayushman jetlearn",
+    "Shujaat Shafqat",
+    "Unmesh Kamble",
+    "Ziyaulhaq Badr",
+    "Visakha",
+    "Jay Nayak",
+    "Ankush Kumar",
+    "Fuzail Saudagar",
+    "Aniket Srivastava",
+    "Shahbaz Ali",
+    "Vikas Jha",
+]
+MTTEAM_TARGETS_RAW = [
+    "AYUSHMAN",
+]
+
+B2C_TARGETS = [norm_name(x) for x in B2C_TARGETS_RAW]
+MTTEAM_TARGETS = [norm_name(x) for x in MTTEAM_TARGETS_RAW]
+
+# --------------------
+# Sidebar
+# --------------------
+
+st.title(APP_TITLE)
+with st.sidebar:
+    st.header("1) Upload")
+    file = st.file_uploader("Upload CSV with columns: Date, Time, Caller (Agent), Call Type, Country Name, Call Status, Call Duration", type=["csv"])
+
+    st.header("2) Agent Set")
+    team_mode = st.radio("Base selection", ["All agents", "B2C team only"],
+                         help="Pick base set here. Use the checkbox below to add MT Team.")
+    add_mt = st.checkbox("Include MT Team (AYUSHMAN)", value=False)
+
+    st.header("3) Mode")
+    mode = st.radio("Calls to include", ["All calls", "Only calls with duration ≥ threshold"], index=0)
+    threshold = st.slider("Threshold (sec)", 10, 300, 60, 5, help="Used when filtering calls by minimum duration.")
+    matrix_median = st.checkbox("Median in Agent × Country table", value=True,
+                                help="Needs a sort per agent/country pair; untick to skip it on very large files.")
+
+    st.header("4) Period (IST)")
+    preset = st.radio("Pick a range", ["Today", "Yesterday", "Custom"], index=0)
+    custom = None
+    if preset == "Custom":
+        custom = st.date_input("Custom range (inclusive)", help="Select start and end date (IST).", value=None)
+
+    st.header("5) Filters")
+    include_missing = st.checkbox("Include rows with missing values for selected filters", value=True,
+                                  help="When ON, rows with blank Agent/Country/Type/Status are kept even if filters are applied.")
+    st.caption("Filter pickers appear after upload.")
+
+if not file:
+    st.info("Upload your CSV to begin.")
+    st.stop()
+
+# --------------------
+# Load & Prepare
+# --------------------
+
+try:
+    df, columns = load_and_prepare(file.getvalue())
+except Exception as e:
+    st.error(f"Failed to read CSV: {e}")
+    st.stop()
+
+# Sidebar pickers (default ALL)
+with st.sidebar:
+    if "Caller" in df.columns:
+        agents = unique_sorted(file.file_id, "Caller", df)
+        sel_agents = st.multiselect("Agent(s)", agents, default=agents)
+    else:
+        sel_agents = None
+
+    if "Country Name" in df.columns:
+        countries = unique_sorted(file.file_id, "Country Name", df)
+        sel_countries = st.multiselect("Country(ies)", countries, default=countries)
+    else:
+        sel_countries = None
+
+    if "Call Type" in df.columns:
+        call_types = unique_sorted(file.file_id, "Call Type", df)
+        sel_types = st.multiselect("Call Type(s) (optional)", call_types, default=call_types)
+    else:
+        sel_types = None
+
+    if "Call Status" in df.columns:
+        statuses = unique_sorted(file.file_id, "Call Status", df)
+        sel_status = st.multiselect("Call Status", statuses, default=statuses)
+    else:
+        sel_status = None
+
+# Every step below only builds a boolean mask over the cached frame; it is sliced once at the end
+# Date filter (by Date only)
+bounds = date_preset_bounds(preset, custom)
+if bounds is not None:
+    start_date, end_date = bounds
+    period_mask = date_mask(df, start_date, end_date)
+else:
+    period_mask = np.ones(len(df), dtype=bool)
+
+# Build team masks
+def mask_for_targets(frame, col, targets_norm):
+    if col not in frame.columns:
+        return np.zeros(len(frame), dtype=bool)
+    # Agents repeat across thousands of rows: match each category once
+    names = frame[col].cat.categories
+    return frame[col].isin(names[match_targets(names, targets_norm)]).to_numpy()
+
+# Apply base team selection
+if team_mode == "B2C team only":
+    team_mask = mask_for_targets(df, "Caller", B2C_TARGETS)
+else:  # All agents
+    team_mask = np.ones(len(df), dtype=bool)
+
+# Additive MT Team checkbox
+if add_mt:
+    team_mask = team_mask | mask_for_targets(df, "Caller", MTTEAM_TARGETS)
+
+# Respect include_missing setting for Agent column
+if include_missing and "Caller" in df.columns:
+    team_mask = team_mask | df["Caller"].isna().to_numpy()
+
+# Generic filters — preserve NaN when include_missing=True
+def build_mask(frame, col, selections, include_missing):
+    """Row mask for one multiselect; all-True when the column or selection is absent."""
+    if selections is None or col not in frame.columns or len(selections) == 0:
+        return np.ones(len(frame), dtype=bool)
+    m = frame[col].isin(set(selections))
+    if include_missing:
+        m = m | frame[col].isna()
+    return m.to_numpy()
+
+filter_mask = np.logical_and.reduce([
+    build_mask(df, col, sel, include_missing)
+    for col, sel in [("Caller", sel_agents), ("Country Name", sel_countries),
+                     ("Call Type", sel_types), ("Call Status", sel_status)]
+])
+
+# Mode filter
+if mode.startswith("Only calls"):
+    mode_mask = (df["_duration_sec"] >= np.float32(threshold)).to_numpy()
+else:
+    mode_mask = np.ones(len(df), dtype=bool)
+
+# df_f (before the duration mode) feeds the 24h tab; df_view feeds KPIs and tables
+f_mask = period_mask & team_mask & filter_mask
+df_f = df.loc[f_mask]
+df_view = df.loc[f_mask & mode_mask]
+
+# --------------------
+# KPIs
+# --------------------
+st.subheader("Overview")
+k1, k2, k3, k4 = st.columns(4)
+k1.metric("Total Calls", f"{len(df_view):,}")
+k2.metric("Avg Duration (sec)", f"{df_view['_duration_sec'].mean():,.1f}" if df_view["_duration_sec"].notna().any() else "NA")
+k3.metric("Median Duration (sec)", f"{df_view['_duration_sec'].median():,.1f}" if df_view["_duration_sec"].notna().any() else "NA")
+k4.metric("Agents", df_view["Caller"].nunique() if "Caller" in df_view.columns else 0)
+st.caption(f"Base: **{team_mode}** | +MT Team: **{add_mt}** | Mode: **{mode}** | Threshold: **{threshold}s** | Range: **{preset}** (IST)")
+
+# --------------------
+# Tabs
+# --------------------
+# One grouping of df_view feeds the Agent, Country and Agent × Country tables;
+# the matrix stays unranked so only its displayed rows get sorted
+dims = [c for c in ["Caller","Country Name"] if c in df_view.columns]
+views = agg_rollup(df_view, dims, "_duration_sec", ranked=False, include_median=matrix_median) if dims else {}
+
+tab1, tab2, tab3, tab4 = st.tabs([
+    "Agent-wise (Agent)", "Country-wise", "Agent × Country", "24h Engagement"
+])
+
+with tab1:
+    st.markdown("### Agent-wise — Total number of calls and durations")
+    if "Caller" in df_view.columns:
+        agg = views[("Caller",)]
+        st.dataframe(agg, use_container_width=True)
+        download_df(agg, "agent_wise_calls.csv")
+        st.altair_chart(calls_bar_chart(agg, "Caller", "Agent"), use_container_width=True)
+    else:
+        st.info("Column 'Caller' (Agent) missing.")
+
+with tab2:
+    st.markdown("### Country-wise — Total number of calls and durations")
+    if "Country Name" in df_view.columns:
+        agg = views[("Country Name",)]
+        st.dataframe(agg, use_container_width=True)
+        download_df(agg, "country_wise_calls.csv")
+        st.altair_chart(calls_bar_chart(agg, "Country Name", "Country"), use_container_width=True)
+    else:
+        st.info("Column 'Country Name' missing.")
+
+with tab3:
+    st.markdown("### Agent × Country — Matrix")
+    if {"Caller","Country Name"}.issubset(df_view.columns):
+        agg = views[("Caller","Country Name")]
+        show_all = len(agg) <= MATRIX_DISPLAY_ROWS or st.checkbox(f"Show all {len(agg):,} rows", key="matrix_show_all")
+        # only the displayed rows are ranked here; the CSV is ranked inside its cached encode
+        st.dataframe(rank_rows(agg, None if show_all else MATRIX_DISPLAY_ROWS), use_container_width=True)
+        download_df(agg, "agent_country_matrix.csv", ranked=True)
+        if agg["Country Name"].nunique() > MATRIX_TOP_COUNTRIES:
+            agg = top_by(agg, "Country Name", "Total Calls", MATRIX_TOP_COUNTRIES)
+            st.caption(f"Chart shows the top {MATRIX_TOP_COUNTRIES} countries by calls; the table and CSV include all.")
+        st.altair_chart(matrix_bar_chart(agg), use_container_width=True)
+    else:
+        st.info("Need 'Caller' (Agent) and 'Country Name'.")
+
+with tab4:
+    st.markdown("### 24h Engagement — When do agents attempt calls, and for which country?")
+    if "_hour" in df_f.columns and df_f["_hour"].notna().any():
+        # at most 24 hours: counted with bincount; rows without an hour are skipped
+        attempts = attempts_by_hour(df_f)
+        c1, c2 = st.columns(2)
+        with c1:
+            st.dataframe(attempts.sort_values("Hour"), use_container_width=True)
+            download_df(attempts.sort_values("Hour"), "attempts_by_hour.csv")
+        with c2:
+            st.altair_chart(hour_bubble_chart(attempts), use_container_width=True)
+
+        st.divider()
+        st.markdown("**Bubble: Hour vs Country (Attempts)**")
+        if "Country Name" in df_f.columns:
+            a2 = attempts_by_hour_and(df_f, "Country Name", keep_missing=True)[["Hour","Country Name","Attempts"]]
+            st.altair_chart(hour_country_bubble_chart(a2), use_container_width=True)
+            download_df(a2.sort_values(["Country Name","Hour"]), "hour_country_bubble.csv")
+
+        st.divider()
+        st.markdown("**Heatmap: Agent × Hour (Attempts)**")
+        if "Caller" in df_f.columns:
+            hh = attempts_by_hour_and(df_f, "Caller", keep_missing=True)
+            hh_chart = hh
+            if len(hh) > HEATMAP_MAX_ROWS:
+                hh_chart = top_by(hh, "Caller", "Attempts", HEATMAP_MAX_ROWS // 24)
+                st.caption(f"Chart shows the top {HEATMAP_MAX_ROWS // 24} agents by attempts; the CSV includes all.")
+            st.altair_chart(agent_hour_heatmap_chart(hh_chart), use_container_width=True)
+            download_df(hh.sort_values(["Caller","Hour"]), "agent_hour_heatmap.csv")
+    else:
+        st.info("No valid Time values to compute 24h engagement; counts/tables still use Date-based logic.")
+
+st.caption("v3.6: Radio for base set (All / B2C), plus additive checkbox 'Include MT Team (AYUSHMAN)'. Date-only counting, include-missing, robust duration parsing.")
@@ -0,0 +1,311 @@
+"""Shared parsing, aggregation, chart and download helpers for the TalkTime pages.
+
+app_talktime_v3.py (main page) and pages/app_talktime_v3_6.py both import from here,
+and share the parsing code. The parse cache is keyed on the file bytes and the Date order,
+so each page caches its own parse (v3 reads dates month-first, v3.6 picks the order that
+parses more rows).
+"""
+
+from io import BytesIO
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import altair as alt
+
+TZ = "Asia/Kolkata"
+DIM_COLS = ["Caller", "Country Name", "Call Type", "Call Status"]
+SOURCE_COLS = DIM_COLS + ["Call Duration", "Date", "Time"]   # 'To Name' and the rest are never read
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y"]
+STREAM_MIN_BYTES = 64 * 1024 * 1024  # uploads above this are parsed chunk by chunk
+CHUNK_ROWS = 200_000
+DENSE_KEY_MAX = 1 << 22     # largest combined group-key space counted with a dense bincount
+RANK_COLS = ["Total Calls", "Total Duration (sec)"]
+MATRIX_TOP_COUNTRIES = 15   # countries drawn in the Agent × Country chart
+MATRIX_DISPLAY_ROWS = 500   # Agent × Country table rows rendered until 'Show all' is ticked
+HEATMAP_MAX_ROWS = 5_000    # Agent × Hour cells sent to the browser
+
+# --------------------
+# Parsing
+# --------------------
+
+def parse_durations(s):
+    """Vectorized Call Duration -> seconds: plain numbers, MM:SS or HH:MM:SS.
+    Durations repeat heavily, so only the distinct values are parsed and mapped back by code."""
+    codes, uniques = pd.factorize(s)
+    u = pd.Series(uniques)
+    vals = pd.to_numeric(u, errors="coerce").astype("float64")
+    bad = vals.isna()
+    if bad.any():
+        parts = u[bad].astype(str).str.strip().str.extract(
+            r"^(?:(?P<h>\d+(?:\.\d+)?):)?(?P<m>\d+(?:\.\d+)?):(?P<s>\d+(?:\.\d+)?)$"
+        )
+        h = pd.to_numeric(parts["h"], errors="coerce").fillna(0)
+        m = pd.to_numeric(parts["m"], errors="coerce")
+        sec = pd.to_numeric(parts["s"], errors="coerce")
+        vals.loc[bad] = (h*3600 + m*60 + sec).to_numpy()
+    # code -1 (missing) picks the trailing NaN
+    return pd.Series(np.append(vals.to_numpy(), np.nan)[codes], index=s.index)
+
+def sniff_date_format(sample, dayfirst=None):
+    """First fixed format that parses every value in `sample`, else None.
+    dayfirst=True/False only considers formats with that day/month order."""
+    skip = {True: "%m", False: "%d"}.get(dayfirst)
+    for fmt in DATE_FORMATS:
+        if skip and fmt.startswith(skip):
+            continue
+        try:
+            pd.to_datetime(sample, format=fmt)
+            return fmt
+        except (ValueError, TypeError):
+            pass
+    return None
+
+def parse_date_best(series, dayfirst=None, fmt=None):
+    """dayfirst=None picks whichever of day-/month-first parses more rows; True/False fixes the order.
+    fmt skips sniffing (e.g. a format sniffed once for every chunk of a file)."""
+    # Happy path: one fixed-format parse, kept only if it parses every non-null value
+    if fmt is None:
+        fmt = sniff_date_format(series.head(1000).dropna().head(50), dayfirst)
+    if fmt is not None:
+        try:
+            return pd.to_datetime(series, format=fmt)
+        except (ValueError, TypeError):
+            pass
+    if dayfirst is not None:
+        return pd.to_datetime(series, errors="coerce", dayfirst=dayfirst)
+    d1 = pd.to_datetime(series, errors="coerce", dayfirst=True)
+    d2 = pd.to_datetime(series, errors="coerce", dayfirst=False)
+    return d1 if d1.notna().sum() >= d2.notna().sum() else d2
+
+def combine_date_time(dates, time_col):
+    """Localized timestamps from already-parsed dates plus the raw Time strings."""
+    d = dates.dt.normalize()
+    # attempt parsing time flexibly: strict formats first, then inference;
+    # each attempt only sees the rows still unparsed, so every row is parsed about once
+    t_str = time_col.astype(str).str.strip()
+    t = pd.to_datetime(t_str, format="%H:%M:%S", errors="coerce")
+    for fmt in ("%I:%M:%S %p", "%H:%M", "%I:%M %p", None):
+        todo = t.isna() & time_col.notna()
+        if not todo.any():
+            break
+        t[todo] = pd.to_datetime(t_str[todo], format=fmt, errors="coerce")
+    # time since midnight, added onto the date, then localize once
+    dt = d + (t - t.dt.normalize())
+    return dt.dt.tz_localize(TZ, nonexistent="NaT", ambiguous="NaT")
+
+def enrich(df, columns, dayfirst=None, date_fmt=None):
+    """Parsed duration/date/time columns plus the (whitespace-stripped) dimensions."""
+    out = pd.DataFrame({c: df[c].str.strip() for c in DIM_COLS if c in columns}, index=df.index)
+    # 4-byte seconds: exact for any realistic duration; aggregations sum in float64
+    out["_duration_sec"] = parse_durations(df["Call Duration"]) if "Call Duration" in columns else np.nan
+    out["_duration_sec"] = out["_duration_sec"].astype("float32")
+    # Kept as datetime64 at midnight (not Python date objects) so date filters compare natively
+    out["_date_only"] = parse_date_best(df["Date"], dayfirst, date_fmt).dt.normalize() if "Date" in columns else pd.NaT
+    out["_dt_local"] = combine_date_time(out["_date_only"], df["Time"]) if {"Date","Time"}.issubset(columns) else pd.NaT
+    # Derived (1-byte nullable hour)
+    out["_hour"] = out["_dt_local"].dt.hour.astype("Int8")
+    return out
+
+@st.cache_data(show_spinner=False)
+def load_and_prepare(file_bytes, dayfirst=None):
+    """Read the upload and add parsed columns; cached so reruns skip the parse.
+    dayfirst is the Date order (see parse_date_best) and part of the cache key.
+    Returns the prepared frame, sorted by _dt_local with untimed rows last, and the CSV's column names."""
+    columns = pd.read_csv(BytesIO(file_bytes), nrows=0).columns.tolist()
+    # Only the columns the app uses, all read as strings so nothing is inferred
+    usecols = [c for c in columns if c in SOURCE_COLS]
+    dtypes = {c: "string" for c in usecols}
+    if len(file_bytes) > STREAM_MIN_BYTES:
+        # Large upload: parse chunk by chunk so only one chunk of raw strings is alive at a time.
+        # The Date format/order is settled once from the head of the file so every chunk parses alike.
+        date_fmt = None
+        if "Date" in columns:
+            head = pd.read_csv(BytesIO(file_bytes), usecols=["Date"], dtype="string", nrows=1000)["Date"].dropna()
+            date_fmt = sniff_date_format(head.head(50), dayfirst)
+            if dayfirst is None and date_fmt is not None and date_fmt[:2] in ("%d", "%m"):
+                dayfirst = date_fmt.startswith("%d")
+            elif dayfirst is None:
+                dayfirst = (pd.to_datetime(head, errors="coerce", dayfirst=True).notna().sum()
+                            >= pd.to_datetime(head, errors="coerce", dayfirst=False).notna().sum())
+        reader = pd.read_csv(BytesIO(file_bytes), usecols=usecols, dtype=dtypes, chunksize=CHUNK_ROWS, low_memory=False)
+        df = pd.concat([enrich(chunk, columns, dayfirst, date_fmt) for chunk in reader], ignore_index=True)
+    else:
+        try:
+            # Arrow's multithreaded parser; fall back to the C parser on anything it rejects
+            raw = pd.read_csv(BytesIO(file_bytes), usecols=usecols, dtype=dtypes, engine="pyarrow")
+        except Exception:
+            raw = pd.read_csv(BytesIO(file_bytes), usecols=usecols, dtype=dtypes, low_memory=False)
+        df = enrich(raw, columns, dayfirst)
+    # Keep rows sorted so periods are a binary search + slice
+    df = df.sort_values("_dt_local", kind="mergesort", ignore_index=True)
+    # Low-cardinality dimensions: group and filter on integer codes (categories come out sorted)
+    for col in DIM_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df, columns
+
+# --------------------
+# Aggregation
+# --------------------
+
+def agg_summary(df, dims, duration_field, ranked=True, include_median=True):
+    """count/sum/mean from two bincounts over one group id; only the median needs a groupby.
+    Rows come ranked by rank_rows unless ranked=False (rank just the displayed top rows yourself).
+    include_median=False drops the median column and skips its groupby."""
+    # Mixed-radix key over sorted codes gives groupby order: keys sorted, NaN last, observed only
+    key = np.zeros(len(df), dtype=np.int64)
+    uniques = []
+    for d in dims:
+        codes, u = pd.factorize(df[d], sort=True, use_na_sentinel=False)
+        key = key * len(u) + codes
+        uniques.append(u)
+    space = int(np.prod([len(u) for u in uniques]))
+    if space <= DENSE_KEY_MAX:
+        # Dense key space (e.g. agents × countries): bincount the keys, keep non-empty cells
+        # and renumber them in key order; no hashing of the combined key
+        size = np.bincount(key, minlength=space)
+        keys = np.flatnonzero(size)
+        gid = (np.cumsum(size > 0) - 1)[key]
+    else:
+        gid, keys = pd.factorize(key, sort=True)
+    ngroups = len(keys)
+
+    v = df[duration_field].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(v)
+    count = np.bincount(gid, weights=valid, minlength=ngroups).astype(np.int64)
+    total = np.bincount(gid, weights=np.where(valid, v, 0.0), minlength=ngroups)
+    mean = np.divide(total, count, out=np.full(ngroups, np.nan), where=count > 0)
+
+    # Decode each group's key back into its dim values
+    cols = {}
+    for d, u in zip(reversed(dims), reversed(uniques)):
+        keys, codes = np.divmod(keys, len(u))
+        cols[d] = u.take(codes)
+    res = pd.DataFrame({d: cols[d] for d in dims})
+    res["Total Calls"] = count
+    res["Total Duration (sec)"] = total
+    res["Avg Duration (sec)"] = mean
+    if include_median:
+        res["Median Duration (sec)"] = pd.Series(v).groupby(gid).median().to_numpy() if ngroups else np.empty(0)
+    return rank_rows(res) if ranked else res
+
+def agg_rollup(df, dims, duration_field, ranked=True, include_median=True):
+    """agg_summary for the full dims key and for each single dim, from one grouping of the rows.
+    Count/sum roll up from the fine groups; median does not, so each dim gets its own median pass.
+    include_median=False and ranked=False apply to the multi-dim table only."""
+    single = len(dims) == 1
+    fine = agg_summary(df, dims, duration_field, ranked=False, include_median=include_median or single)
+    out = {tuple(dims): rank_rows(fine) if ranked or single else fine}
+    if single:
+        return out
+    v = df[duration_field].to_numpy(dtype=np.float64)
+    for d in dims:
+        # fine[d] holds the same observed values as df[d], so both factorize to the same group order
+        codes, u = pd.factorize(fine[d], sort=True, use_na_sentinel=False)
+        count = np.bincount(codes, weights=fine["Total Calls"], minlength=len(u)).astype(np.int64)
+        total = np.bincount(codes, weights=fine["Total Duration (sec)"], minlength=len(u))
+        gid = pd.factorize(df[d], sort=True, use_na_sentinel=False)[0]
+        res = pd.DataFrame({d: u})
+        res["Total Calls"] = count
+        res["Total Duration (sec)"] = total
+        res["Avg Duration (sec)"] = np.divide(total, count, out=np.full(len(u), np.nan), where=count > 0)
+        res["Median Duration (sec)"] = pd.Series(v).groupby(gid).median().to_numpy()
+        out[(d,)] = rank_rows(res)
+    return out
+
+def rank_rows(res, top_k=None):
+    """Most calls first, then longest total duration; ties keep group order."""
+    if top_k is not None and top_k < len(res):
+        # partial selection: O(N log K) instead of sorting every group
+        return res.nlargest(top_k, RANK_COLS)
+    return res.sort_values(RANK_COLS, ascending=[False, False], kind="stable")
+
+def top_by(frame, col, weight, k):
+    """Rows of `frame` whose `col` value is among the k largest by summed `weight`."""
+    top = frame.groupby(col, observed=True)[weight].sum().nlargest(k).index
+    return frame[frame[col].isin(top)]
+
+def attempts_by_hour(df):
+    hours = df["_hour"].to_numpy(dtype=np.int8, na_value=-1)
+    counts = np.bincount(hours[hours >= 0], minlength=24)
+    hrs = np.flatnonzero(counts)
+    return pd.DataFrame({"Hour": hrs, "Attempts": counts[hrs]})
+
+def attempts_by_hour_and(df, col, keep_missing=False):
+    """Long-form (col, Hour, Attempts) for non-empty cells; col must be categorical.
+    keep_missing=True keeps rows missing `col` as their own (last) group."""
+    hours = df["_hour"].to_numpy(dtype=np.int8, na_value=-1)
+    cats = df[col].cat.categories
+    codes = df[col].cat.codes.to_numpy().astype(np.int64)
+    codes[codes < 0] = len(cats)
+    valid = (hours >= 0) if keep_missing else (hours >= 0) & (codes < len(cats))
+    # flat (code, hour) cell index -> one bincount instead of a hash groupby
+    mat = np.bincount(codes[valid] * 24 + hours[valid], minlength=(len(cats) + 1) * 24).reshape(len(cats) + 1, 24)
+    ci, hi = np.nonzero(mat)
+    labels = pd.Categorical.from_codes(np.where(ci < len(cats), ci, -1), categories=cats)
+    return pd.DataFrame({col: labels, "Hour": hi, "Attempts": mat[ci, hi]})
+
+# --------------------
+# Charts (rendered by st.altair_chart so Streamlit ships the data as Arrow rather than
+# inline JSON, with no 5,000-row cap; building one is cheaper than a cache lookup)
+# --------------------
+
+def calls_bar_chart(agg, dim, title):
+    return alt.Chart(agg).mark_bar().encode(
+        x=alt.X(f"{dim}:N", sort="-y", title=title),
+        y=alt.Y("Total Calls:Q"),
+        tooltip=[dim,"Total Calls","Total Duration (sec)","Avg Duration (sec)","Median Duration (sec)"]
+    ).properties(height=360)
+
+def matrix_bar_chart(agg):
+    # Stacked bar by country within agent
+    return alt.Chart(agg).mark_bar().encode(
+        x=alt.X("Caller:N", sort=alt.SortField("Total Calls", order="descending"), title="Agent"),
+        y=alt.Y("Total Calls:Q"),
+        color=alt.Color("Country Name:N", title="Country"),
+        tooltip=["Caller","Country Name","Total Calls","Total Duration (sec)"]
+    ).properties(height=380)
+
+def hour_bubble_chart(attempts):
+    return alt.Chart(attempts).mark_circle().encode(
+        x=alt.X("Hour:O", title="Hour (0–23, IST)"),
+        y=alt.Y("Attempts:Q"),
+        size=alt.Size("Attempts:Q", legend=None),
+        tooltip=["Hour:O","Attempts:Q"]
+    ).properties(height=340)
+
+def hour_country_bubble_chart(a2):
+    return alt.Chart(a2).mark_circle().encode(
+        x=alt.X("Hour:O"),
+        y=alt.Y("Country Name:N", title="Country"),
+        size=alt.Size("Attempts:Q", legend=None),
+        tooltip=["Hour:O","Country Name:N","Attempts:Q"]
+    ).properties(height=420)
+
+def agent_hour_heatmap_chart(hh):
+    return alt.Chart(hh).mark_rect().encode(
+        x=alt.X("Hour:O"),
+        y=alt.Y("Caller:N", title="Agent"),
+        color=alt.Color("Attempts:Q"),
+        tooltip=["Caller","Hour","Attempts"]
+    ).properties(height=420)
+
+# --------------------
+# Downloads
+# --------------------
+
+@st.cache_data(show_spinner=False)
+def csv_bytes(fingerprint, _df, ranked=False):
+    return (rank_rows(_df) if ranked else _df).to_csv(index=False).encode("utf-8")
+
+def frame_fingerprint(df):
+    """Cheap content key: shape, columns and position-weighted row hashes (row order matters for the CSV)."""
+    h = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return df.shape, tuple(df.columns), int((h * np.arange(1, len(h) + 1, dtype=np.uint64)).sum())
+
+def download_df(df, filename, label="Download CSV", ranked=False):
+    # Reruns with unchanged data reuse the encoded CSV instead of re-serializing it;
+    # ranked=True sorts an unranked agg_summary frame only when the bytes are (re)built
+    csv = csv_bytes(frame_fingerprint(df), df, ranked)
+    st.download_button(label, csv, file_name=filename, mime="text/csv")